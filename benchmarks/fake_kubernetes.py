@@ -0,0 +1,111 @@
+"""
+In-memory stand-in for the parts of the `kubernetes` package used by k8s.py.
+
+install() registers it in sys.modules so the admission controller can be
+imported without a cluster. Pods admitted by the load generator are added
+with add_pod(); the fake watch reports them as Succeeded once their
+exec_time elapsed, which releases them from the solver like in a cluster.
+"""
+from types import ModuleType, SimpleNamespace
+import sys
+import threading
+import time
+
+
+class FakeCluster(object):
+    def __init__(self, nodes: int, cpu: str, memory: str, colors: list[str]):
+        self.lock = threading.Lock()
+        self.nodes = [SimpleNamespace(
+            metadata=SimpleNamespace(name=f"node-{i}", annotations={"colors": f"{colors[i % len(colors)]},{colors[(i + 1) % len(colors)]}"}),
+            status=SimpleNamespace(capacity={"cpu": cpu, "memory": memory})) for i in range(nodes)]
+        # pod name -> (pod, finish time)
+        self.pods: dict[str, tuple[SimpleNamespace, float]] = {}
+        self.reported: set[str] = set()
+
+    def add_pod(self, name: str, namespace: str, labels: dict, annotations: dict, resources, exec_time: float):
+        pod = SimpleNamespace(
+            metadata=SimpleNamespace(name=name, namespace=namespace, labels=labels, annotations=annotations),
+            spec=SimpleNamespace(containers=[SimpleNamespace(resources=resources)]))
+        with self.lock:
+            self.pods[name] = (pod, time.time() + exec_time)
+            self.reported.discard(name)
+
+    def finished_pods(self) -> list[SimpleNamespace]:
+        now = time.time()
+        with self.lock:
+            # pods stay listed until deleted, but every pod is reported once
+            finished = [name for name, (_, finish) in self.pods.items() if finish <= now and name not in self.reported]
+            self.reported.update(finished)
+            return [self.pods[name][0] for name in finished]
+
+
+cluster: FakeCluster = None
+
+
+class ApiException(Exception):
+    pass
+
+
+class Model(SimpleNamespace):
+    """Generic replacement for the V1* model classes."""
+
+
+class CoreV1Api(object):
+    def list_node(self):
+        return SimpleNamespace(items=cluster.nodes)
+
+    def list_namespaced_pod(self, *args, **kwargs):
+        # only handed to watch.Watch.stream, which produces the events itself
+        return SimpleNamespace(items=[])
+
+    def read_namespaced_pod(self, name: str, namespace: str):
+        with cluster.lock:
+            if name not in cluster.pods:
+                raise ApiException(f"Pod {name} not found")
+            return cluster.pods[name][0]
+
+    def delete_namespaced_pod(self, name: str, namespace: str, body=None):
+        with cluster.lock:
+            if cluster.pods.pop(name, None) is None:
+                raise ApiException(f"Pod {name} not found")
+
+    def create_namespaced_pod(self, namespace: str, body):
+        labels = body.metadata.labels
+        remaining = int(labels["arrival_time"]) + int(labels["exec_time"]) - time.time()
+        cluster.add_pod(body.metadata.name, namespace, labels, body.metadata.annotations, body.spec.containers[0].resources, max(remaining, 0))
+
+
+class Watch(object):
+    def __init__(self):
+        self.stopped = threading.Event()
+
+    def stream(self, func, namespace, **kwargs):
+        while not self.stopped.wait(.05):
+            for pod in cluster.finished_pods():
+                yield {"type": "ADDED", "object": pod}
+
+    def stop(self):
+        self.stopped.set()
+
+
+def install(nodes: int = 5, cpu: str = "4", memory: str = "8Gi", colors: list[str] = None) -> FakeCluster:
+    global cluster
+    cluster = FakeCluster(nodes, cpu, memory, colors or ["red", "green", "blue"])
+
+    kubernetes = ModuleType("kubernetes")
+    kubernetes.client = ModuleType("kubernetes.client")
+    kubernetes.config = ModuleType("kubernetes.config")
+    kubernetes.watch = ModuleType("kubernetes.watch")
+
+    kubernetes.client.CoreV1Api = CoreV1Api
+    for model in ["V1DeleteOptions", "V1Pod", "V1ObjectMeta", "V1PodSpec", "V1Container", "V1ResourceRequirements"]:
+        setattr(kubernetes.client, model, Model)
+    kubernetes.config.load_incluster_config = lambda: None
+    kubernetes.config.load_config = lambda: None
+    kubernetes.watch.Watch = Watch
+
+    sys.modules["kubernetes"] = kubernetes
+    sys.modules["kubernetes.client"] = kubernetes.client
+    sys.modules["kubernetes.config"] = kubernetes.config
+    sys.modules["kubernetes.watch"] = kubernetes.watch
+    return cluster
@@ -0,0 +1,151 @@
+"""
+Load generator and end-to-end latency benchmark for the /mutate endpoint.
+
+Starts the admission controller in-process on a local port with a fake
+Kubernetes client (see fake_kubernetes.py), sends synthetic AdmissionReview
+requests at a fixed rate and concurrency and reports latency percentiles,
+throughput and the queue-wait vs solve-time breakdown recorded by the
+controller.
+
+Usage: python benchmarks/mutate_load.py [--requests 1000] [--rate 100] [--concurrency 8] [--nodes 5]
+
+Requires Python 3.12 like the controller itself (nested quotes in its
+f-strings are a SyntaxError on older versions).
+"""
+from concurrent.futures import ThreadPoolExecutor
+import argparse
+import base64
+import json
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+import uuid
+
+BENCHMARKS_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(BENCHMARKS_DIR, "..", "src"))
+sys.path.insert(0, BENCHMARKS_DIR)
+
+import fake_kubernetes
+import requests
+from werkzeug.serving import make_server
+
+COLORS = ["red", "green", "blue"]
+thread_local = threading.local()
+
+def admission_review(i: int, exec_time: tuple[int, int]) -> dict:
+    return {
+        "apiVersion": "admission.k8s.io/v1",
+        "kind": "AdmissionReview",
+        "request": {
+            "uid": str(uuid.uuid4()),
+            "object": {
+                "metadata": {
+                    "name": f"task-{i}",
+                    "annotations": {
+                        "v2x.context/priority": str(random.randint(1, 5)),
+                        "v2x.context/color": random.choice(COLORS),
+                        "v2x.context/exec_time": str(random.randint(*exec_time))
+                    }
+                },
+                "spec": {
+                    "containers": [{
+                        "name": "task",
+                        "resources": {"requests": {"cpu": f"{random.randint(100, 1000)}m", "memory": f"{random.randint(64, 1024)}Mi"}}
+                    }]
+                }
+            }
+        }
+    }
+
+def send(url: str, review: dict) -> tuple[float, bool]:
+    if not hasattr(thread_local, "session"):
+        thread_local.session = requests.Session()
+    start = time.perf_counter()
+    response = thread_local.session.post(url, json=review).json()["response"]
+    latency = time.perf_counter() - start
+
+    if response["allowed"]:
+        # the pod now "runs" in the fake cluster until its exec_time elapses
+        pod = review["request"]["object"]
+        labels = {}
+        for patch in json.loads(base64.b64decode(response["patch"])):
+            if patch["path"].startswith("/metadata/labels/"):
+                labels[patch["path"].split("/")[-1]] = patch["value"]
+        fake_kubernetes.cluster.add_pod(pod["metadata"]["name"], "tasks", labels, pod["metadata"]["annotations"], fake_kubernetes.Model(requests=pod["spec"]["containers"][0]["resources"]["requests"]), int(labels["exec_time"]))
+    return (latency, response["allowed"])
+
+def percentile(values: list[float], p: float) -> float:
+    return values[min(int(len(values) * p), len(values) - 1)]
+
+def histogram_quantile(histogram, q: float) -> float:
+    # same linear interpolation within a bucket as PromQL histogram_quantile
+    buckets = [(float(s.labels["le"]), s.value) for m in histogram.collect() for s in m.samples if s.name.endswith("_bucket")]
+    if not buckets or buckets[-1][1] == 0:
+        return 0.0
+    rank = q * buckets[-1][1]
+    lower_bound, lower_count = 0.0, 0.0
+    for upper_bound, count in buckets:
+        if count >= rank:
+            if upper_bound == float("inf"):
+                return lower_bound
+            return lower_bound + (upper_bound - lower_bound) * (rank - lower_count) / max(count - lower_count, 1e-9)
+        lower_bound, lower_count = upper_bound, count
+    return lower_bound
+
+def histogram_mean(histogram) -> float:
+    samples = {s.name: s.value for m in histogram.collect() for s in m.samples}
+    count = next((v for k, v in samples.items() if k.endswith("_count")), 0)
+    total = next((v for k, v in samples.items() if k.endswith("_sum")), 0)
+    return total / count if count else 0.0
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=1000)
+    parser.add_argument("--rate", type=float, default=100, help="requests per second, 0 sends as fast as possible")
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--nodes", type=int, default=5)
+    parser.add_argument("--exec-time", type=int, nargs=2, default=[1, 5], metavar=("MIN", "MAX"))
+    parser.add_argument("--port", type=int, default=18443)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    random.seed(args.seed)
+    fake_kubernetes.install(nodes=args.nodes)
+    os.environ.setdefault("MAX_REALLOC", "4")
+    os.environ.setdefault("SIMULATION_NAME", "loadtest")
+    # the controller writes app.log, simulation.id and test_bed.csv into the working directory
+    os.chdir(tempfile.mkdtemp(prefix="frico-load-"))
+
+    import mutating_admission_controller as controller
+
+    server = make_server("127.0.0.1", args.port, controller.admission_controller, threaded=True)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    url = f"http://127.0.0.1:{args.port}/mutate"
+
+    reviews = [admission_review(i, tuple(args.exec_time)) for i in range(args.requests)]
+    start = time.perf_counter()
+
+    def paced(i: int) -> tuple[float, bool]:
+        if args.rate > 0:
+            delay = start + i / args.rate - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+        return send(url, reviews[i])
+
+    with ThreadPoolExecutor(max_workers=args.concurrency) as executor:
+        results = list(executor.map(paced, range(args.requests)))
+    elapsed = time.perf_counter() - start
+    server.shutdown()
+
+    latencies = sorted(latency for latency, _ in results)
+    allowed = sum(1 for _, a in results if a)
+    print(f"requests: {len(results)} allowed: {allowed} rejected: {len(results) - allowed} elapsed: {elapsed:.2f}s throughput: {len(results) / elapsed:.1f} req/s")
+    print("latency    " + " ".join(f"p{int(p * 100)}: {percentile(latencies, p) * 1000:.2f}ms" for p in (.5, .9, .99)) + f" max: {latencies[-1] * 1000:.2f}ms")
+    for name, histogram in (("queue wait", controller.queue_wait_histogram), ("solve     ", controller.solve_time_histogram)):
+        print(f"{name} mean: {histogram_mean(histogram) * 1000:.2f}ms " + " ".join(f"p{int(q * 100)}: {histogram_quantile(histogram, q) * 1000:.2f}ms" for q in (.5, .9, .99)))
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,63 @@
+"""
+Preemption-heavy FRICO workload.
+
+Fills a small cluster with low priority tasks and then submits a stream of
+high priority arrivals, so most solve() calls end up in the offloading phase.
+
+Usage: python benchmarks/preemption.py [--nodes 10] [--tasks 2000] [--realloc 4]
+"""
+import argparse
+import os
+import random
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+
+from frico import FRICO, Node, Task, Priority
+
+COLORS = ["red", "green", "blue"]
+
+def build_solver(nodes: int, realloc: int) -> FRICO:
+    return FRICO([Node(i, f"node-{i}", 4000, 8 * 1024**3, random.sample(COLORS, 2)) for i in range(nodes)], realloc)
+
+def random_task(i: int, priorities: list[Priority]) -> Task:
+    return Task(f"task-{i}", f"task-{i}", random.randint(100, 1000), random.randint(128, 1024) * 1024**2, random.choice(priorities), random.choice(COLORS))
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--nodes", type=int, default=10)
+    parser.add_argument("--tasks", type=int, default=2000)
+    parser.add_argument("--realloc", type=int, default=4)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    random.seed(args.seed)
+    solver = build_solver(args.nodes, args.realloc)
+
+    # saturate the cluster with low priority tasks
+    i = 0
+    while True:
+        task = random_task(i, [Priority.NONE, Priority.LOW])
+        i += 1
+        if not solver.is_admissable(task) or solver.solve(task)[0] == '':
+            break
+
+    durations = []
+    allocated = 0
+    rescheduled = 0
+    for j in range(args.tasks):
+        task = random_task(i + j, [Priority.HIGH, Priority.CRITICAL])
+        start = time.perf_counter()
+        node_name, tasks_to_reschedule = solver.solve(task)
+        durations.append(time.perf_counter() - start)
+        allocated += node_name != ''
+        rescheduled += len(tasks_to_reschedule)
+
+    durations.sort()
+    print(f"solves: {len(durations)} allocated: {allocated} rescheduled: {rescheduled} offloaded: {solver.get_offloaded_tasks()}")
+    print(f"mean: {statistics.mean(durations) * 1e6:.1f}us p50: {durations[len(durations) // 2] * 1e6:.1f}us p99: {durations[int(len(durations) * .99)] * 1e6:.1f}us total: {sum(durations):.3f}s")
+
+if __name__ == '__main__':
+    main()
@@ -27,18 +27,28 @@ class BaseTask(object):
         self.id = id
 
 class Task(BaseTask):
-    def __init__(self, id: str, name: str, cpu_requirement: int, memory_requirement: int, priority: Priority, color: str):
+    def __init__(self, id: str, name: str, cpu_requirement: int, memory_requirement: int, priority: Priority, color: str, exec_time: int = 0, arrival_time: Optional[int] = None):
         self.priority = priority
         self.name = name
         self.node_cpu_capacity = 0
         self.node_memory_capacity = 0
+        # objective_value() cached on allocation, it only changes when the task moves to another node
+        self.objective = 0
+        self.exec_time = exec_time
+        self.arrival_time = arrival_time if arrival_time is not None else int(time.time())
+        # set while the task holds a lookahead reservation and waits for capacity to free up
+        self.reserved_at: Optional[int] = None
         super().__init__(id, cpu_requirement, memory_requirement, color)
+
+    def expected_release(self) -> int:
+        return self.arrival_time + self.exec_time
     
     def objective_value(self):
         return (self.priority.value / 5) * ((((self.node_cpu_capacity - self.cpu_requirement) / self.node_cpu_capacity) + ((self.node_memory_capacity - self.memory_requirement) / self.node_memory_capacity)) / 2)
 
     def __lt__(self, other):
-        return (self.objective_value()) < (other.objective_value())
+        # ties broken by id, SortedList.remove bisects to the exact task
+        return (self.objective, self.id) < (other.objective, other.id)
 class Node(object):
     id: int
     name: str
@@ -49,6 +59,12 @@ class Node(object):
     released_tasks = 0
     assigned_tasks = 0
     allocated_tasks: SortedList
+    # (expected release time, task id, cpu, memory) of running tasks with known exec time
+    expected_releases: SortedList
+    # reserved tasks in reservation order, they don't run until the node has room for them
+    pending_tasks: list[Task]
+    # reserved tasks that started since the solver last collected them
+    started_tasks: list[Task]
 
     def __init__(self, id: int, name: str, cpu_capacity: int, memory_capacity: int, colors: list[str]):
         self.cpu_capacity = cpu_capacity
@@ -59,6 +75,9 @@ class Node(object):
         self.remaining_cpu_capacity = cpu_capacity
         self.remaining_memory_capacity = memory_capacity
         self.allocated_tasks = SortedList()
+        self.expected_releases = SortedList()
+        self.pending_tasks = []
+        self.started_tasks = []
     
     def __lt__(self, other):
         return (self.id, (self.cpu_capacity - self.remaining_cpu_capacity) / self.cpu_capacity, (self.memory_capacity - self.remaining_memory_capacity) / self.memory_capacity) < (other.id, (other.cpu_capacity - other.remaining_cpu_capacity) / other.cpu_capacity, (other.memory_capacity - other.remaining_memory_capacity) / other.memory_capacity)
@@ -66,16 +85,24 @@ class Node(object):
     def remaining_capacity(self) -> tuple[int, int]:
         return (self.remaining_cpu_capacity, self.remaining_memory_capacity)
     
-    def allocate_task(self, task: Task):
-        if self.remaining_cpu_capacity >= task.cpu_requirement and self.remaining_memory_capacity >= task.memory_requirement:
+    def allocate_task(self, task: Task, reserve: bool = False):
+        # reserve allows a temporary overcommit that is covered by predicted releases
+        if reserve or (self.remaining_cpu_capacity >= task.cpu_requirement and self.remaining_memory_capacity >= task.memory_requirement):
             task.node_memory_capacity = self.memory_capacity
             task.node_cpu_capacity = self.cpu_capacity
+            task.objective = task.objective_value()
             self.allocated_tasks.add(task)
+            if reserve:
+                # keep the reservation time of a restored reservation
+                task.reserved_at = task.reserved_at or int(time.time())
+                self.pending_tasks.append(task)
+            else:
+                self.start_task(task)
             self.assigned_tasks += 1
             self.remaining_cpu_capacity = int(self.remaining_cpu_capacity - task.cpu_requirement)
             self.remaining_memory_capacity = int(self.remaining_memory_capacity - task.memory_requirement)   
             self.current_value += task.priority.value
-            self.current_objective += task.objective_value()
+            self.current_objective += task.objective
             return True
         else:
             raise Exception("Capacity violation")
@@ -84,14 +111,57 @@ class Node(object):
         return self.remaining_cpu_capacity >= task.cpu_requirement and self.remaining_memory_capacity >= task.memory_requirement
             
 
+    def start_task(self, task: Task):
+        if task.reserved_at is not None:
+            # a reserved task only starts running now, its exec time counts from here
+            task.reserved_at = None
+            task.arrival_time = int(time.time())
+        if task.exec_time > 0:
+            self.expected_releases.add(self.release_entry(task))
+
+    def start_reservations(self):
+        # capacity left for pending tasks once the running ones are accounted for
+        free_cpu = self.remaining_cpu_capacity + sum(t.cpu_requirement for t in self.pending_tasks)
+        free_memory = self.remaining_memory_capacity + sum(t.memory_requirement for t in self.pending_tasks)
+        while self.pending_tasks and free_cpu >= self.pending_tasks[0].cpu_requirement and free_memory >= self.pending_tasks[0].memory_requirement:
+            task = self.pending_tasks.pop(0)
+            free_cpu -= task.cpu_requirement
+            free_memory -= task.memory_requirement
+            self.start_task(task)
+            self.started_tasks.append(task)
+
+    def release_entry(self, task: Task) -> tuple[int, str, int, int]:
+        return (task.expected_release(), task.id, task.cpu_requirement, task.memory_requirement)
+
+    def releasable_capacity(self, since: int, deadline: int) -> tuple[int, int]:
+        # tasks overdue since before `since` overran their exec time or were never reported, don't count on them
+        cpu = 0
+        memory = 0
+        for release_time, _, cpu_requirement, memory_requirement in self.expected_releases.irange((since,), (deadline + 1,), inclusive=(True, False)):
+            cpu += cpu_requirement
+            memory += memory_requirement
+        return (cpu, memory)
+
+    def can_reserve(self, task: Task, since: int, deadline: int) -> bool:
+        cpu, memory = self.releasable_capacity(since, deadline)
+        return self.remaining_cpu_capacity + cpu >= task.cpu_requirement and self.remaining_memory_capacity + memory >= task.memory_requirement
+
     def release_task(self, task: Task):
         self.allocated_tasks.remove(task)
+        if task in self.started_tasks:
+            self.started_tasks.remove(task)
+        if task.reserved_at is not None:
+            self.pending_tasks.remove(task)
+        elif task.exec_time > 0:
+            self.expected_releases.discard(self.release_entry(task))
         self.released_tasks += 1
         self.assigned_tasks -= 1
         self.remaining_cpu_capacity = int(self.remaining_cpu_capacity + task.cpu_requirement)
         self.remaining_memory_capacity = int(self.remaining_memory_capacity + task.memory_requirement)        
         self.current_value -= task.priority.value
-        self.current_objective -= task.objective_value()
+        self.current_objective -= task.objective
+        if self.pending_tasks:
+            self.start_reservations()
 
     def get_task_by_id(self, id: str) -> Task:
         task = next((t for t in self.allocated_tasks if t.id == id), None)
@@ -107,12 +177,26 @@ class FRICO:
     realloc_threshold: int
     offloaded_tasks: int
     current_objective: int
-    def __init__(self, nodes: list[Node], realloc_threshold: int) -> None:
+    lookahead: int
+    reserved_tasks: int
+    latency_weight: float
+    def __init__(self, nodes: list[Node], realloc_threshold: int, store=None, lookahead: int = 0, latency=None, latency_weight: float = 0) -> None:
         self.knapsacks = SortedList(nodes)
         self.realloc_threshold = realloc_threshold
         self.offloaded_tasks = 0
         self.current_objective = 0
-        self.knapsacks = [(self.calculate_capacity(n), n) for n in nodes]
+        # seconds ahead in which predicted releases count as free capacity, 0 disables lookahead.
+        # Releases overdue by more than the same window are no longer counted.
+        self.lookahead = lookahead
+        self.reserved_tasks = 0
+        # optional prometheus.LatencyMatrix, its node score is added to the heap key with latency_weight
+        self.latency = latency
+        self.latency_weight = latency_weight
+        # optional persistence.SolverStore journaling every allocate/release
+        self.store = store
+        # stable view of all nodes, the heap is temporarily emptied while it is being searched
+        self.nodes = nodes
+        self.knapsacks = [(self.heap_key(n), n) for n in nodes]
         heapq.heapify(self.knapsacks)
 
     def get_current_objective(self):
@@ -121,16 +205,22 @@ class FRICO:
     def calculate_capacity(self, node: Node) -> float:
         return (((node.cpu_capacity - node.remaining_cpu_capacity) / node.cpu_capacity) + ((node.memory_capacity - node.remaining_memory_capacity) / node.memory_capacity)) / 2
 
+    def heap_key(self, node: Node) -> float:
+        # weighted sum, a node up to latency_weight more loaded can win on a better latency score
+        if self.latency is None or self.latency_weight == 0:
+            return self.calculate_capacity(node)
+        return self.calculate_capacity(node) + self.latency_weight * self.latency.score(node.name)
+
     def update_heap(self):
         # Rebuild the heap when the priorities change
-        self.knapsacks = [(self.calculate_capacity(n), n) for _, n in self.knapsacks]
+        self.knapsacks = [(self.heap_key(n), n) for _, n in self.knapsacks]
         heapq.heapify(self.knapsacks)
 
     def get_offloaded_tasks(self):
         return self.offloaded_tasks
 
     def get_node_by_name(self, name: str) -> Node:
-        node = next((k[1] for k in self.knapsacks if k[1].name == name), None)
+        node = next((n for n in self.nodes if n.name == name), None)
         if node is None:
             raise Exception(f"Node with name {name} not found")
         return node
@@ -141,23 +231,38 @@ class FRICO:
             logging.info(f"{k[1].name} - {k[1].remaining_capacity()}")
 
     def release(self, node: Node, task: Task):
+        if self.store is not None:
+            with self.store.lock:
+                self._release(node, task)
+                self.store.record_release(task.id)
+                self.collect_started_tasks()
+        else:
+            self._release(node, task)
+            self.collect_started_tasks()
+        for k in self.knapsacks:
+            logging.info(f"{k[1].name} - {k[1].remaining_capacity()} - {len(k[1].allocated_tasks)}")
+
+    def _release(self, node: Node, task: Task):
         try:
             node.release_task(task)
         except Exception as e:
             logging.warning(f"Exeception occcured while releasing task {task.id} from {node.name} {e}")
-        for k in self.knapsacks:
-            logging.info(f"{k[1].name} - {k[1].remaining_capacity()} - {len(k[1].allocated_tasks)}")
     
     def is_admissable(self, task: Task) -> bool:
         temp_knapsacks = []
         overall_free_cpu = 0
         overall_free_memory = 0
+        now = int(time.time())
 
         while self.knapsacks:
             capacity, knapsack = heapq.heappop(self.knapsacks)
 
             overall_free_cpu += knapsack.remaining_cpu_capacity
             overall_free_memory +=  knapsack.remaining_memory_capacity
+            if self.lookahead > 0:
+                releasable_cpu, releasable_memory = knapsack.releasable_capacity(now - self.lookahead, now + self.lookahead)
+                overall_free_cpu += releasable_cpu
+                overall_free_memory += releasable_memory
 
             temp_knapsacks.append((capacity, knapsack))
 
@@ -174,6 +279,58 @@ class FRICO:
             heapq.heappush(self.knapsacks, item)
 
     def solve(self, task: Task) -> (str, list[tuple[Task, Node]]):
+        if self.store is None:
+            result = self._solve(task)
+            self.collect_started_tasks()
+            return result
+
+        with self.store.lock:
+            node_name, tasks_to_reschedule = self._solve(task)
+            if node_name != '':
+                self.store.record_allocate(task, node_name)
+            for t, k in tasks_to_reschedule:
+                if k is None:
+                    self.store.record_release(t.id, True)
+                else:
+                    self.store.record_allocate(t, k.name)
+            self.collect_started_tasks()
+        return (node_name, tasks_to_reschedule)
+
+    def collect_started_tasks(self):
+        # reservations that started running, journaled again so a restore doesn't treat them as pending
+        for node in self.nodes:
+            for t in node.started_tasks:
+                logging.info(f"Reserved task {t.id} started on {node.name}")
+                if self.store is not None:
+                    self.store.record_allocate(t, node.name)
+            node.started_tasks.clear()
+
+    def expire_reservations(self) -> list[Task]:
+        # a reservation is backed by releases predicted within the lookahead window, if the task
+        # still has not started after another window the prediction failed and it is offloaded
+        if self.lookahead <= 0:
+            return []
+        if self.store is None:
+            return self._expire_reservations()
+        with self.store.lock:
+            expired = self._expire_reservations()
+            for t in expired:
+                self.store.record_release(t.id, True)
+            self.collect_started_tasks()
+        return expired
+
+    def _expire_reservations(self) -> list[Task]:
+        deadline = int(time.time()) - 2 * self.lookahead
+        expired = [(n, t) for n in self.nodes for t in n.pending_tasks if t.reserved_at < deadline]
+        for node, t in expired:
+            logging.info(f"Reservation of task {t.id} on {node.name} expired")
+            node.release_task(t)
+            self.offloaded_tasks += 1
+        if expired:
+            self.update_heap()
+        return [t for _, t in expired]
+
+    def _solve(self, task: Task) -> (str, list[tuple[Task, Node]]):
         tasks_to_reschedule: list[tuple[Task, Node]] = []
         suitable_node = self.find_applicable(task)
 
@@ -181,13 +338,22 @@ class FRICO:
             suitable_node.allocate_task(task)
             self.update_heap()
             return (suitable_node.name, tasks_to_reschedule)
+
+        reservable_node = self.find_reservable(task) if self.lookahead > 0 else None
+        if reservable_node is not None:
+            # admit against capacity released shortly instead of moving or offloading running tasks
+            logging.info(f"Reserving capacity for task {task.id} on {reservable_node.name}")
+            reservable_node.allocate_task(task, reserve=True)
+            self.reserved_tasks += 1
+            self.update_heap()
+            return (reservable_node.name, tasks_to_reschedule)
         
         else:
             allocated = False
             choosen_node: Optional[Node] = None
             searched_knapsacks: list[tuple[float, Node]] = []
 
-            temp_knapsacks = [(self.calculate_capacity(n[1]), n[1]) for n in self.knapsacks]
+            temp_knapsacks = [(self.heap_key(n[1]), n[1]) for n in self.knapsacks]
             heapq.heapify(temp_knapsacks)
 
             while self.knapsacks and not choosen_node:
@@ -232,6 +398,7 @@ class FRICO:
                 tasks: list[Task] = []
                 s_allocated = False
                 allocated_node = ''
+                relaxed_node: Optional[Node] = None
                 s_searched_knapsacks : list[tuple[float, Node]] = []
                 while self.knapsacks and not s_allocated:
                     capacity, knapsack = heapq.heappop(self.knapsacks)
@@ -240,13 +407,17 @@ class FRICO:
                         cummulative_cpu = 0
                         cummulatice_memory = 0
                         has_enough_space = False
+                        potential_objective = self.calculate_potential_objective(task, knapsack.cpu_capacity, knapsack.memory_capacity)
                         for t in iter(knapsack.allocated_tasks):
-                            if t.objective_value() <= self.calculate_potential_objective(task, knapsack.cpu_capacity, knapsack.memory_capacity):
-                                tasks.append(t)
-                                # tasks.add(t)
-                                cummulative_cpu += t.cpu_requirement
-                                cummulatice_memory += t.memory_requirement
-                            if cummulative_cpu >= task.cpu_requirement and cummulatice_memory >= task.memory_requirement:
+                            # allocated tasks are ordered by objective, no later task can be a victim
+                            if t.objective > potential_objective:
+                                break
+                            tasks.append(t)
+                            # tasks.add(t)
+                            cummulative_cpu += t.cpu_requirement
+                            cummulatice_memory += t.memory_requirement
+                            # remaining capacity is negative on a node overcommitted by lookahead reservations
+                            if knapsack.remaining_cpu_capacity + cummulative_cpu >= task.cpu_requirement and knapsack.remaining_memory_capacity + cummulatice_memory >= task.memory_requirement:
                                 # there are already enough tasks to relax node N in favor of task T
                                 has_enough_space = True
                                 break
@@ -254,40 +425,75 @@ class FRICO:
                                 break
                         
                         if has_enough_space:
+                            # drop victims the node can keep next to task T anyway, most valuable first
+                            for t in reversed(tasks[:]):
+                                if knapsack.remaining_cpu_capacity + cummulative_cpu - t.cpu_requirement >= task.cpu_requirement and knapsack.remaining_memory_capacity + cummulatice_memory - t.memory_requirement >= task.memory_requirement:
+                                    tasks.remove(t)
+                                    cummulative_cpu -= t.cpu_requirement
+                                    cummulatice_memory -= t.memory_requirement
                             # here we know that all tasks in the list must be offloaded in order to relax node N for task T
                             for t in tasks:
                                 self.release(knapsack, t)
                             self.allocate(knapsack, task)
                             s_allocated = True
                             allocated_node = knapsack.name
+                            relaxed_node = knapsack
                     s_searched_knapsacks.append((capacity, knapsack))
                 
                 self.return_to_heap(s_searched_knapsacks)
                 self.update_heap()
                 if s_allocated:
-                    for t in tasks:
-                        l_searched_knapsacks: list[tuple[float, Node]] = []
-                        task_allocated = False
-                        while self.knapsacks and not task_allocated:
-                            capacity, knapsack = heapq.heappop(self.knapsacks)
-                            if task.color in knapsack.colors and knapsack.can_allocate(t):
-                                knapsack.allocate_task(t)
-                                task_allocated = True
-                                self.update_heap()
-                                tasks_to_reschedule.append((t, knapsack))
-                            l_searched_knapsacks.append((capacity, knapsack))
-                        
-                        if not task_allocated:
-                            tasks_to_reschedule.append((t, None))
-                            self.offloaded_tasks += 1
-                        
-                        self.return_to_heap(l_searched_knapsacks)
-                        self.update_heap()    
+                    moves = self.replace_victims(tasks, relaxed_node)
+                    # victims moved by the relocation phase of this solve only need their final placement
+                    victim_ids = {t.id for t, _ in moves}
+                    tasks_to_reschedule = [(t, k) for t, k in tasks_to_reschedule if t.id not in victim_ids] + moves
                 return (allocated_node, tasks_to_reschedule)
+
+    def replace_victims(self, tasks: list[Task], source: Node) -> list[tuple[Task, Optional[Node]]]:
+        # snapshot of the other nodes in heap order with their free capacity, consumed as victims get placed
+        candidates = [[n, n.remaining_cpu_capacity, n.remaining_memory_capacity] for _, n in sorted(self.knapsacks) if n is not source]
+        moves: list[tuple[Task, Optional[Node]]] = []
+
+        # largest victims first so small ones fill the gaps left behind
+        for t in sorted(tasks, key=lambda t: (t.cpu_requirement, t.memory_requirement), reverse=True):
+            target = None
+            for candidate in candidates:
+                node, free_cpu, free_memory = candidate
+                if t.color in node.colors and free_cpu >= t.cpu_requirement and free_memory >= t.memory_requirement:
+                    candidate[1] -= t.cpu_requirement
+                    candidate[2] -= t.memory_requirement
+                    target = node
+                    break
+            moves.append((t, target))
+
+        for t, node in moves:
+            if node is None:
+                self.offloaded_tasks += 1
+            else:
+                node.allocate_task(t)
+        self.update_heap()
+        return moves
     
     def calculate_potential_objective(self, task: Task, cpu_capacity: int, memory_capacity: int):
         return task.priority.value / ((((task.cpu_requirement / cpu_capacity) + (task.memory_requirement / memory_capacity)) / 2))
     
+    def find_reservable(self, task: Task) -> Optional[Node]:
+        now = int(time.time())
+        best_knapsack = None
+        temp_knapsacks = []
+
+        while self.knapsacks and not best_knapsack:
+            capacity, knapsack = heapq.heappop(self.knapsacks)
+
+            if task.color in knapsack.colors and knapsack.can_reserve(task, now - self.lookahead, now + self.lookahead):
+                best_knapsack = knapsack
+
+            temp_knapsacks.append((capacity, knapsack))
+
+        self.return_to_heap(temp_knapsacks)
+
+        return best_knapsack
+
     def find_applicable(self, task: Task) -> Optional[Node]:
         best_knapsack = None
         temp_knapsacks = []
@@ -4,6 +4,8 @@ import jsonpatch
 from frico import FRICO, Task, Node, Priority, handle_pod
 from prometheus_flask_exporter import PrometheusMetrics
 from prometheus_client import Counter, Gauge, Histogram
+from persistence import SolverStore
+from prometheus import LatencyMatrix
 from k8s import init_nodes, watch_pods, parse_cpu_to_millicores, parse_memory_to_bytes, reschedule, delete_pod
 import os
 import threading
@@ -26,11 +28,16 @@ total_tasks_counter = Counter('total_tasks', 'Total tasks', ['simulation'])
 reallocated_tasks_counter = Counter('reallocated_tasks', 'Realocated tasks', ['simulation'])
 objective_value_gauge = Gauge('objective_value', 'Current objective value', ['simulation'])
 offloaded_tasks_counter = Counter('offloaded_tasks', 'Offloaded tasks', ['simulation'])
+reserved_tasks_counter = Counter('reserved_tasks', 'Tasks admitted against lookahead reservations', ['simulation'])
+expired_reservations_counter = Counter('expired_reservations', 'Reserved tasks offloaded because capacity did not free up in time', ['simulation'])
 processing_pod_time = Gauge('pod_processing_time', 'Task allocation time', ['pod', 'simulation'])
 kube_processing_pod_time = Gauge('kube_pod_processing_time', 'K8S task processing time', ['pod', 'simulation'])
 # priority_histogram = Histogram('priority', 'Priorities', ['pod'])
 priority_counter = Gauge('priority', 'Task priority', ['pod', 'priority', 'simulation'])
 unallocated_priority_counter = Gauge('unallocated_priorities', 'Unallocated task priority', ['priority', 'simulation'])
+LATENCY_BUCKETS = (.0001, .00025, .0005, .001, .0025, .005, .01, .025, .05, .1, .25, .5, 1, 2.5, 5, 10, float("inf"))
+queue_wait_histogram = Histogram('pod_queue_wait_time', 'Time a pod waits in the processing queue', ['simulation'], buckets=LATENCY_BUCKETS)
+solve_time_histogram = Histogram('pod_solve_time', 'FRICO admission and solve time', ['simulation'], buckets=LATENCY_BUCKETS)
 
 admission_controller = Flask(__name__)
 
@@ -44,6 +51,13 @@ nodes: list[Node] = init_nodes()
 
 MAX_REALLOC = int(os.environ.get("MAX_REALLOC"))
 SIMULATION_NAME = os.environ.get("SIMULATION_NAME")
+SNAPSHOT_DIR = os.environ.get("SNAPSHOT_DIR")
+SNAPSHOT_INTERVAL = int(os.environ.get("SNAPSHOT_INTERVAL", "30"))
+LOOKAHEAD_WINDOW = int(os.environ.get("LOOKAHEAD_WINDOW", "0"))
+PROMETHEUS_URL = os.environ.get("PROMETHEUS_URL")
+LATENCY_REFRESH_INTERVAL = int(os.environ.get("LATENCY_REFRESH_INTERVAL", "15"))
+LATENCY_TTL = int(os.environ.get("LATENCY_TTL", "60"))
+LATENCY_WEIGHT = float(os.environ.get("LATENCY_WEIGHT", "0.1"))
 
 SIMULATION_NAME = SIMULATION_NAME + f"-{str(int(time.time()))}"
 
@@ -52,19 +66,47 @@ with open('simulation.id', 'w', newline='') as file:
     file.close()
 
 
-solver = FRICO(nodes, MAX_REALLOC)
+store = SolverStore(SNAPSHOT_DIR, SNAPSHOT_INTERVAL) if SNAPSHOT_DIR else None
+
+latency = LatencyMatrix(PROMETHEUS_URL, [n.name for n in nodes], LATENCY_REFRESH_INTERVAL, LATENCY_TTL) if PROMETHEUS_URL else None
+
+solver = FRICO(nodes, MAX_REALLOC, store, LOOKAHEAD_WINDOW, latency, LATENCY_WEIGHT)
 
 stop_event = threading.Event()
 
+if latency is not None:
+    latency_thread = threading.Thread(target=latency.run, args=(stop_event,), daemon=True)
+    latency_thread.start()
+
+if store is not None:
+    store.restore(solver)
+    snapshot_thread = threading.Thread(target=store.run, args=(solver, stop_event), daemon=True)
+    snapshot_thread.start()
+
 thread = threading.Thread(target=watch_pods, args=(solver, stop_event), daemon=True)
 thread.start()
 
+def offload_expired_reservations():
+    for task in solver.expire_reservations():
+        try:
+            delete_pod(task.name, "tasks")
+        except Exception as e:
+            logging.warning(f"There was an issue deleting pod {task.name} with expired reservation")
+        offloaded_tasks_counter.labels(simulation=SIMULATION_NAME).inc()
+        expired_reservations_counter.labels(simulation=SIMULATION_NAME).inc()
+
 def process_pod():
     while not stop_event.is_set():
         if stop_event.is_set():
             break
         # Get the pod data and its unique identifier from the queue
-        pod_id, pod = pod_queue.get()
+        try:
+            pod_id, pod, enqueued_at = pod_queue.get(timeout=1)
+        except queue.Empty:
+            # reservations have to expire even when no pods arrive
+            offload_expired_reservations()
+            continue
+        queue_wait_histogram.labels(simulation=SIMULATION_NAME).observe(time.perf_counter() - enqueued_at)
         try:
         # Process the pod here (mutate, etc.)
         # Replace the following line with your actual mutation logic
@@ -86,18 +128,23 @@ def process_pod():
                 writer.writerow(row_to_append)
                 file.close()
 
-            task = Task(pod_id, pod_metadata["name"], parse_cpu_to_millicores(pod_spec["containers"][0]["resources"]["requests"]["cpu"]), parse_memory_to_bytes(pod_spec["containers"][0]["resources"]["requests"]["memory"]), priority, color)
+            task = Task(pod_id, pod_metadata["name"], parse_cpu_to_millicores(pod_spec["containers"][0]["resources"]["requests"]["cpu"]), parse_memory_to_bytes(pod_spec["containers"][0]["resources"]["requests"]["memory"]), priority, color, int(exec_time))
             total_tasks_counter.labels(simulation=SIMULATION_NAME).inc()
 
             node_name = ''
             shit_to_be_done: list[tuple[Task, Node]] = []
+            offload_expired_reservations()
+            reserved_tasks = solver.reserved_tasks
             frico_start_time = time.perf_counter()
             if solver.is_admissable(task):
                 node_name, shit_to_be_done = solver.solve(task)
             frico_end_time = time.perf_counter()
+            if solver.reserved_tasks > reserved_tasks:
+                reserved_tasks_counter.labels(simulation=SIMULATION_NAME).inc()
 
             allowed = node_name != ''
             processing_pod_time.labels(pod=pod_id, simulation=SIMULATION_NAME).set(frico_end_time - frico_start_time)
+            solve_time_histogram.labels(simulation=SIMULATION_NAME).observe(frico_end_time - frico_start_time)
             if allowed:
                 allocated_tasks_counter.labels(node=node_name, simulation=SIMULATION_NAME).inc()
                 objective_value_gauge.labels(simulation=SIMULATION_NAME).inc(task.objective_value())
@@ -183,6 +230,8 @@ def handle_sigterm(*args):
     stop_event.set()
     thread.join(timeout=5)
     pod_process_thread.join(timeout=5)
+    if store is not None:
+        store.snapshot(solver)
     os._exit(0)
 
 signal.signal(signal.SIGTERM, handle_sigterm)
@@ -199,8 +248,8 @@ def deployment_webhook_mutate():
     pod_metadata = pod["metadata"]
     pod_id = pod_metadata["name"]
     request_events[pod_id] = threading.Event()
-    pod_queue.put((pod_id, pod))
     kube_processing_time_start = time.perf_counter()
+    pod_queue.put((pod_id, pod, kube_processing_time_start))
     request_events[pod_id].wait()
     kube_processing_time_end = time.perf_counter()
     kube_processing_pod_time.labels(pod=pod_id, simulation=SIMULATION_NAME).set(kube_processing_time_end - kube_processing_time_start)
@@ -0,0 +1,155 @@
+from frico import FRICO, Task, Priority
+from threading import Event, Lock, RLock
+import json
+import logging
+import os
+import pickle
+
+SNAPSHOT_FILE = "solver.snapshot"
+JOURNAL_PREFIX = "journal."
+JOURNAL_SUFFIX = ".log"
+
+def dump_task(task: Task) -> tuple:
+    return (task.id, task.name, task.cpu_requirement, task.memory_requirement, task.priority.value, task.color, task.exec_time, task.arrival_time, task.reserved_at)
+
+def load_task(state) -> Task:
+    id, name, cpu_requirement, memory_requirement, priority, color, exec_time, arrival_time, reserved_at = state
+    task = Task(id, name, cpu_requirement, memory_requirement, Priority(priority), color, exec_time, arrival_time)
+    task.reserved_at = reserved_at
+    return task
+
+class SolverStore(object):
+    """
+    Persists solver state as periodic snapshots plus an append-only journal
+    of allocate and release operations made since the last snapshot.
+
+    Every journal entry carries a sequence number. Taking a snapshot rotates
+    the journal to a new segment, so restore loads the snapshot and replays
+    only the entries with a higher sequence number.
+    """
+    directory: str
+    interval: int
+    seq: int
+
+    def __init__(self, directory: str, interval: int) -> None:
+        self.directory = directory
+        self.interval = interval
+        self.seq = 0
+        self.segment = None
+        # guards the solver while it is mutated/journaled and while a snapshot is captured
+        self.lock = RLock()
+        # the periodic thread and the SIGTERM handler may snapshot at the same time
+        self.snapshot_lock = Lock()
+        os.makedirs(directory, exist_ok=True)
+
+    def snapshot_path(self) -> str:
+        return os.path.join(self.directory, SNAPSHOT_FILE)
+
+    def segments(self) -> list[tuple[int, str]]:
+        segments = []
+        for f in os.listdir(self.directory):
+            if f.startswith(JOURNAL_PREFIX) and f.endswith(JOURNAL_SUFFIX):
+                segments.append((int(f[len(JOURNAL_PREFIX):-len(JOURNAL_SUFFIX)]), os.path.join(self.directory, f)))
+        return sorted(segments)
+
+    def append(self, entry: list):
+        with self.lock:
+            self.seq += 1
+            if self.segment is None:
+                self.segment = open(os.path.join(self.directory, f"{JOURNAL_PREFIX}{self.seq:020d}{JOURNAL_SUFFIX}"), 'a')
+            self.segment.write(json.dumps([self.seq] + entry, separators=(',', ':')) + "\n")
+            self.segment.flush()
+
+    def record_allocate(self, task: Task, node_name: str):
+        self.append(["a", dump_task(task), node_name])
+
+    def record_release(self, task_id: str, offloaded: bool = False):
+        self.append(["r", task_id, offloaded])
+
+    def capture(self, solver: FRICO) -> dict:
+        # only copy the state while holding the lock, serialization happens outside of it
+        with self.lock:
+            state = {
+                "seq": self.seq,
+                "offloaded_tasks": solver.offloaded_tasks,
+                "nodes": [(n.name, [dump_task(t) for t in n.allocated_tasks]) for n in solver.nodes]
+            }
+            if self.segment is not None:
+                self.segment.close()
+                self.segment = None
+        return state
+
+    def snapshot(self, solver: FRICO):
+        with self.snapshot_lock:
+            state = self.capture(solver)
+            tmp_path = self.snapshot_path() + ".tmp"
+            with open(tmp_path, 'wb') as file:
+                pickle.dump(state, file, protocol=pickle.HIGHEST_PROTOCOL)
+                file.flush()
+                os.fsync(file.fileno())
+            os.replace(tmp_path, self.snapshot_path())
+
+            # segments opened before the capture are fully covered by the snapshot
+            for start, path in self.segments():
+                if start <= state["seq"]:
+                    os.remove(path)
+        logging.info(f"Solver snapshot written at sequence {state['seq']}")
+
+    def restore(self, solver: FRICO):
+        placements: dict[str, tuple[Task, str]] = {}
+        snapshot_seq = 0
+        if os.path.exists(self.snapshot_path()):
+            with open(self.snapshot_path(), 'rb') as file:
+                state = pickle.load(file)
+            snapshot_seq = state["seq"]
+            solver.offloaded_tasks = state["offloaded_tasks"]
+            for node_name, tasks in state["nodes"]:
+                for t in tasks:
+                    placements[t[0]] = (load_task(t), node_name)
+
+        self.seq = snapshot_seq
+        for _, path in self.segments():
+            with open(path, 'rb+') as file:
+                valid_size = 0
+                for line in file:
+                    try:
+                        entry = json.loads(line)
+                    except ValueError:
+                        # torn write at the tail of the journal, cut it off so a new segment
+                        # starting at the same sequence number never appends after it
+                        logging.warning(f"Skipping corrupted journal entry in {path}")
+                        file.truncate(valid_size)
+                        break
+                    valid_size += len(line)
+                    seq, op = entry[0], entry[1]
+                    if seq <= snapshot_seq:
+                        continue
+                    if op == "a":
+                        task = load_task(entry[2])
+                        placements[task.id] = (task, entry[3])
+                    elif op == "r":
+                        placements.pop(entry[2], None)
+                        if entry[3]:
+                            solver.offloaded_tasks += 1
+                    self.seq = max(self.seq, seq)
+
+        # running tasks first, then lookahead reservations in their original order on top of them
+        for task, node_name in sorted(placements.values(), key=lambda p: (p[0].reserved_at is not None, p[0].reserved_at or 0)):
+            try:
+                solver.get_node_by_name(node_name).allocate_task(task, reserve=task.reserved_at is not None)
+            except Exception as e:
+                logging.warning(f"Could not restore task {task.id} on {node_name}: {e}")
+        # releases may have happened while the webhook was down
+        for node in solver.nodes:
+            node.start_reservations()
+        solver.collect_started_tasks()
+        solver.update_heap()
+        logging.info(f"Restored {len(placements)} tasks from solver state at sequence {self.seq}")
+
+    def run(self, solver: FRICO, stop_signal: Event):
+        while not stop_signal.wait(self.interval):
+            try:
+                self.snapshot(solver)
+            except Exception as e:
+                logging.warning(f"Taking solver snapshot failed {e}")
+        logging.info("Stopping snapshot thread")
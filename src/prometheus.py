@@ -1,5 +1,16 @@
+from array import array
+from requests.adapters import HTTPAdapter
+from threading import Event
 import requests
 import json
+import logging
+import math
+import time
+
+# pooled connections reused by every query instead of a new connection per call
+session = requests.Session()
+session.mount("http://", HTTPAdapter(pool_connections=4, pool_maxsize=4))
+session.mount("https://", HTTPAdapter(pool_connections=4, pool_maxsize=4))
 
 def query_prometheus(prometheus_url, query):
     """
@@ -12,7 +23,7 @@ def query_prometheus(prometheus_url, query):
     Returns:
     - dict: The JSON response from Prometheus.
     """
-    response = requests.get(f"{prometheus_url}/api/v1/query", params={'query': query})
+    response = session.get(f"{prometheus_url}/api/v1/query", params={'query': query}, timeout=5)
     if response.status_code == 200:
         return json.loads(response.content.decode('utf-8'))
     else:
@@ -20,11 +31,74 @@ def query_prometheus(prometheus_url, query):
 
 def query_icmp_from_node(prometheus_url: str, nodeName: str):
     query = "probe_duration_seconds{{from='{}'}}".format(nodeName)
-    response = requests.get(f"{prometheus_url}/api/v1/query", params={'query': query})
-    if response.status_code == 200:
-        return json.loads(response.content.decode('utf-8'))
-    else:
-        raise Exception(f"Query failed with status code {response.status_code}")
+    return query_prometheus(prometheus_url, query)
+
+class LatencyMatrix(object):
+    """
+    Node-to-node probe_duration_seconds matrix refreshed in the background.
+
+    Latencies are kept in a flat array indexed by node position, missing
+    probes are NaN. Besides the matrix a normalized score per node (mean
+    latency to the other nodes divided by the worst mean) is precomputed on
+    every refresh, so the solver only does a dict lookup. Scores older than
+    ttl seconds are ignored.
+    """
+    prometheus_url: str
+    interval: int
+    ttl: int
+
+    def __init__(self, prometheus_url: str, node_names: list[str], interval: int, ttl: int) -> None:
+        self.prometheus_url = prometheus_url
+        self.interval = interval
+        self.ttl = ttl
+        self.node_names = node_names
+        self.index = {name: i for i, name in enumerate(node_names)}
+        self.matrix = array('d', [math.nan] * (len(node_names) ** 2))
+        self.scores: dict[str, float] = {}
+        self.updated_at = 0.0
+
+    def latency(self, from_node: str, to_node: str) -> float:
+        if time.monotonic() - self.updated_at > self.ttl:
+            return math.nan
+        return self.matrix[self.index[from_node] * len(self.node_names) + self.index[to_node]]
+
+    def score(self, node_name: str) -> float:
+        if time.monotonic() - self.updated_at > self.ttl:
+            return 0.0
+        return self.scores.get(node_name, 0.0)
+
+    def refresh(self):
+        response = query_prometheus(self.prometheus_url, "probe_duration_seconds")
+        n = len(self.node_names)
+        matrix = array('d', [math.nan] * (n * n))
+        for r in response["data"]["result"]:
+            # blackbox exporter instance label is the probed target, optionally with a port
+            from_node = r["metric"].get("from")
+            to_node = r["metric"].get("instance", "").split(":")[0]
+            if from_node in self.index and to_node in self.index:
+                matrix[self.index[from_node] * n + self.index[to_node]] = float(r["value"][1])
+
+        means: dict[str, float] = {}
+        for name, i in self.index.items():
+            row = [v for v in matrix[i * n:(i + 1) * n] if not math.isnan(v)]
+            if row:
+                means[name] = sum(row) / len(row)
+        worst = max(means.values(), default=0.0)
+        scores = {name: mean / worst for name, mean in means.items()} if worst > 0 else {}
+
+        # swap in the new arrays at once, readers never see a partially built matrix
+        self.matrix = matrix
+        self.scores = scores
+        self.updated_at = time.monotonic()
+
+    def run(self, stop_signal: Event):
+        while not stop_signal.is_set():
+            try:
+                self.refresh()
+            except Exception as e:
+                logging.warning(f"Refreshing latency matrix failed {e}")
+            stop_signal.wait(self.interval)
+        logging.info("Stopping latency refresh thread")
 
 
 # prom_url = "http://localhost:9090"
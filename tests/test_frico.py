@@ -0,0 +1,95 @@
+import time
+
+from frico import FRICO, Node, Task, Priority
+
+
+def test_preemption_accounts_for_overcommitted_node():
+    now = int(time.time())
+    a = Node(0, "a", 1000, 1000, ["red"])
+    b = Node(1, "b", 1000, 1000, ["blue"])
+    solver = FRICO([a, b], 2, lookahead=10)
+    solver.solve(Task("soon", "soon", 500, 500, Priority.NONE, "red", 5, now))
+    solver.solve(Task("long", "long", 500, 500, Priority.NONE, "red", 600, now))
+    solver.solve(Task("reserved", "reserved", 400, 400, Priority.NONE, "red", 5))
+    assert a.remaining_capacity() == (-400, -400)
+
+    task = Task("critical", "critical", 700, 700, Priority.CRITICAL, "red", 5)
+    assert solver.is_admissable(task)
+    node_name, tasks_to_reschedule = solver.solve(task)
+
+    # evicting both running tasks still leaves no room, nothing may be released
+    assert node_name == ''
+    assert tasks_to_reschedule == []
+    assert {t.id for t in a.allocated_tasks} == {"soon", "long", "reserved"}
+
+def test_overdue_releases_are_not_reserved_against():
+    now = int(time.time())
+    a = Node(0, "a", 1000, 1000, ["red"])
+    solver = FRICO([a], 4, lookahead=10)
+    solver.solve(Task("overrun", "overrun", 800, 800, Priority.NONE, "red", 5, now - 60))
+
+    task = Task("next", "next", 500, 500, Priority.NONE, "red", 5)
+    assert not solver.is_admissable(task)
+    assert solver.find_reservable(task) is None
+
+    solver.solve(Task("due", "due", 100, 100, Priority.NONE, "red", 5, now - 3))
+    assert solver.find_reservable(Task("small", "small", 150, 150, Priority.NONE, "red", 5)) is a
+
+def test_only_needed_victims_are_evicted():
+    a = Node(0, "a", 1000, 1000, ["red"])
+    solver = FRICO([a], 4)
+    solver.solve(Task("small", "small", 100, 100, Priority.NONE, "red"))
+    solver.solve(Task("big", "big", 500, 500, Priority.LOW, "red"))
+    solver.solve(Task("fill", "fill", 400, 400, Priority.HIGH, "red"))
+
+    node_name, tasks_to_reschedule = solver.solve(Task("critical", "critical", 500, 500, Priority.CRITICAL, "red"))
+
+    # the small task is selected first but the node can keep it next to the incoming one
+    assert node_name == "a"
+    assert [(t.id, k) for t, k in tasks_to_reschedule] == [("big", None)]
+    assert {t.id for t in a.allocated_tasks} == {"small", "fill", "critical"}
+
+def test_reservations_do_not_back_each_other():
+    now = int(time.time())
+    a = Node(0, "a", 1000, 1000, ["red"])
+    solver = FRICO([a], 4, lookahead=10)
+    solver.solve(Task("running", "running", 900, 900, Priority.NONE, "red", 5, now))
+
+    admitted = []
+    for i in range(10):
+        task = Task(f"task-{i}", f"task-{i}", 900, 900, Priority.NONE, "red", 5)
+        admitted.append(solver.solve(task)[0] if solver.is_admissable(task) else '')
+
+    # only the running task's release backs a reservation, the reserved one has not started yet
+    assert admitted == ["a"] + [''] * 9
+    assert a.remaining_capacity() == (-800, -800)
+    assert [t.id for t in a.pending_tasks] == ["task-0"]
+
+def test_reservation_starts_when_capacity_frees_up():
+    now = int(time.time())
+    a = Node(0, "a", 1000, 1000, ["red"])
+    solver = FRICO([a], 4, lookahead=10)
+    running = Task("running", "running", 900, 900, Priority.NONE, "red", 5, now - 5)
+    solver.solve(running)
+    reserved = Task("reserved", "reserved", 900, 900, Priority.NONE, "red", 5)
+    solver.solve(reserved)
+
+    solver.release(a, running)
+
+    assert a.pending_tasks == []
+    assert reserved.reserved_at is None
+    assert a.releasable_capacity(now, reserved.arrival_time + 5) == (900, 900)
+
+def test_reservation_expires_when_capacity_does_not_free_up():
+    now = int(time.time())
+    a = Node(0, "a", 1000, 1000, ["red"])
+    solver = FRICO([a], 4, lookahead=10)
+    solver.solve(Task("running", "running", 900, 900, Priority.NONE, "red", 5, now))
+    reserved = Task("reserved", "reserved", 900, 900, Priority.NONE, "red", 5)
+    solver.solve(reserved)
+    assert solver.expire_reservations() == []
+
+    reserved.reserved_at = now - 21
+    assert solver.expire_reservations() == [reserved]
+    assert a.remaining_capacity() == (100, 100)
+    assert solver.get_offloaded_tasks() == 1
@@ -0,0 +1,146 @@
+import os
+import random
+import sys
+import threading
+
+from frico import FRICO, Node, Task, Priority, handle_pod
+from persistence import SolverStore
+
+
+def build_solver(directory: str) -> FRICO:
+    nodes = [Node(i, f"node-{i}", 4000, 8 * 1024**3, ["red", "blue"]) for i in range(3)]
+    return FRICO(nodes, 4, SolverStore(directory, 30))
+
+def placements(solver: FRICO) -> dict[str, list[str]]:
+    return {n.name: sorted(t.id for t in n.allocated_tasks) for n in solver.nodes}
+
+def submit(solver: FRICO, start: int, count: int):
+    for i in range(start, start + count):
+        task = Task(f"task-{i}", f"task-{i}", random.randint(100, 1500), random.randint(2**28, 2**31), Priority(random.randint(1, 5)), random.choice(["red", "blue"]), 10)
+        if solver.is_admissable(task):
+            solver.solve(task)
+        if i % 7 == 0:
+            node = solver.knapsacks[0][1]
+            if node.allocated_tasks:
+                handle_pod(solver, node.allocated_tasks[0].id, node.name)
+
+def test_restore_snapshot_and_journal(tmp_path):
+    random.seed(1)
+    solver = build_solver(tmp_path)
+    submit(solver, 0, 30)
+    solver.store.snapshot(solver)
+    submit(solver, 30, 30)
+    assert solver.offloaded_tasks > 0
+
+    restored = build_solver(tmp_path)
+    restored.store.restore(restored)
+    assert placements(restored) == placements(solver)
+    assert restored.offloaded_tasks == solver.offloaded_tasks
+    assert restored.store.seq == solver.store.seq
+
+    # the restored store keeps journaling after the replayed sequence numbers
+    submit(restored, 60, 20)
+    again = build_solver(tmp_path)
+    again.store.restore(again)
+    assert placements(again) == placements(restored)
+    assert again.offloaded_tasks == restored.offloaded_tasks
+
+def test_snapshot_removes_covered_segments(tmp_path):
+    random.seed(2)
+    solver = build_solver(tmp_path)
+    submit(solver, 0, 10)
+    solver.store.snapshot(solver)
+    assert solver.store.segments() == []
+
+    submit(solver, 10, 10)
+    assert all(start > 0 for start, _ in solver.store.segments())
+
+def test_restore_skips_torn_journal_tail(tmp_path):
+    solver = build_solver(tmp_path)
+    solver.solve(Task("a", "a", 100, 100, Priority.LOW, "red"))
+    solver.solve(Task("b", "b", 100, 100, Priority.LOW, "red"))
+    _, path = solver.store.segments()[-1]
+    solver.store.segment.close()
+
+    # cut the last entry in half as if the process died while writing it
+    size = os.path.getsize(path)
+    with open(path, 'r+') as file:
+        lines = file.readlines()
+        file.truncate(size - len(lines[-1]) // 2)
+
+    restored = build_solver(tmp_path)
+    restored.store.restore(restored)
+    assert [t for ids in placements(restored).values() for t in ids] == ["a"]
+    assert restored.store.seq == 1
+
+    # the next entry reuses sequence number 2 and must survive another restore
+    restored.solve(Task("c", "c", 100, 100, Priority.LOW, "red"))
+    again = build_solver(tmp_path)
+    again.store.restore(again)
+    assert placements(again) == placements(restored)
+
+def test_capture_during_admission_sees_every_node(tmp_path):
+    nodes = [Node(i, f"node-{i}", 4000, 8 * 1024**3, ["red"]) for i in range(20)]
+    solver = FRICO(nodes, 4, SolverStore(tmp_path, 30))
+    task = Task("probe", "probe", 100, 100, Priority.LOW, "red")
+    stop = threading.Event()
+
+    def admit():
+        while not stop.is_set():
+            solver.is_admissable(task)
+
+    # switch threads often so captures land in the middle of the heap walk
+    switch_interval = sys.getswitchinterval()
+    sys.setswitchinterval(1e-6)
+    admission = threading.Thread(target=admit)
+    admission.start()
+    try:
+        for _ in range(5000):
+            assert len(solver.store.capture(solver)["nodes"]) == len(nodes)
+    finally:
+        stop.set()
+        admission.join()
+        sys.setswitchinterval(switch_interval)
+
+def test_concurrent_snapshots_leave_a_valid_snapshot(tmp_path):
+    random.seed(4)
+    solver = build_solver(tmp_path)
+    submit(solver, 0, 30)
+
+    errors = []
+
+    def snapshot():
+        try:
+            for _ in range(50):
+                solver.store.snapshot(solver)
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=snapshot) for _ in range(4)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert errors == []
+
+    restored = build_solver(tmp_path)
+    restored.store.restore(restored)
+    assert placements(restored) == placements(solver)
+
+def test_restore_keeps_reservations_pending(tmp_path):
+    solver = build_solver(tmp_path)
+    solver.lookahead = 10
+    node = solver.get_node_by_name("node-0")
+    running = Task("running", "running", 3000, 100, Priority.NONE, "red", 5)
+    node.allocate_task(running)
+    solver.update_heap()
+    for n in solver.nodes[1:]:
+        n.colors = ["blue"]
+    reserved = Task("reserved", "reserved", 3000, 100, Priority.NONE, "red", 5)
+    assert solver.solve(reserved)[0] == "node-0"
+    solver.store.snapshot(solver)
+
+    restored = build_solver(tmp_path)
+    restored.store.restore(restored)
+    pending = restored.get_node_by_name("node-0").pending_tasks
+    assert [(t.id, t.reserved_at) for t in pending] == [("reserved", reserved.reserved_at)]
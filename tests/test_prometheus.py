@@ -0,0 +1,49 @@
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import json
+import math
+import threading
+
+import pytest
+
+from prometheus import LatencyMatrix
+
+PROBES = [("a", "b", .001), ("b", "a", .001), ("a", "c", .005), ("b", "c", .01), ("c", "b", .01)]
+
+
+@pytest.fixture
+def prometheus_url():
+    class StubHandler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            body = json.dumps({"status": "success", "data": {"resultType": "vector", "result": [
+                {"metric": {"from": f, "instance": f"{t}:9115"}, "value": [0, str(v)]} for f, t, v in PROBES
+            ]}}).encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), StubHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield f"http://127.0.0.1:{server.server_port}"
+    server.shutdown()
+
+def test_refresh_builds_matrix_and_scores(prometheus_url):
+    matrix = LatencyMatrix(prometheus_url, ["a", "b", "c"], 15, 60)
+    matrix.refresh()
+
+    assert matrix.latency("a", "c") == .005
+    assert math.isnan(matrix.latency("c", "a"))
+    assert matrix.score("a") == pytest.approx(.3)
+    assert matrix.score("b") == pytest.approx(.55)
+    assert matrix.score("c") == pytest.approx(1.0)
+
+def test_scores_expire_after_ttl(prometheus_url):
+    matrix = LatencyMatrix(prometheus_url, ["a", "b", "c"], 15, 60)
+    assert matrix.score("a") == 0.0
+    matrix.refresh()
+    matrix.ttl = -1
+    assert matrix.score("c") == 0.0
+    assert math.isnan(matrix.latency("a", "b"))